@@ -6,6 +6,8 @@
     Main entrypoint for the FastAPI application
 """
 
+import os
+
 import uvicorn
 
 
@@ -18,4 +20,12 @@ class App:
 app = App()
 
 if __name__ == "__main__":
-    uvicorn.run("src.server:APP", host="0.0.0.0", port=4000, log_level="info", workers=1)
+    # get the number of CPUs this process may run on. this honors any CPU set restrictions, unlike os.cpu_count()
+    cpu_count: int = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 2)
+
+    # get the number of worker processes. the workers are async, so one per CPU is enough to keep them busy.
+    # note that each worker opens its own DB connections, so the DB max_connections setting must be at least
+    # the worker count times the connection pool size.
+    workers: int = int(os.getenv('WEB_CONCURRENCY', str(max(2, cpu_count))))
+
+    uvicorn.run("src.server:APP", host="0.0.0.0", port=4000, log_level="info", workers=workers, loop="uvloop", http="httptools")
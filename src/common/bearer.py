@@ -7,6 +7,11 @@
 
     Author: Phil Owen, 6/27/2023
 """
+import os
+import time
+
+import jwt
+
 from fastapi import Request, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
@@ -18,6 +23,15 @@ class JWTBearer(HTTPBearer):
     class to handle JWT operations
 
     """
+    # declare the cache of validated tokens (token: expiration time). this is shared by all instances
+    valid_token_cache: dict = {}
+
+    # declare the max number of tokens to cache
+    token_cache_size: int = 4096
+
+    # declare how long (in seconds) a validated token is trusted before it is verified again
+    token_cache_ttl: int = int(os.getenv('TOKEN_CACHE_TTL', '300'))
+
     def __init__(self, sec: Security, auto_error: bool = True):
         # save the security object
         self.sec = sec
@@ -42,9 +56,60 @@ class JWTBearer(HTTPBearer):
                 # raise error if no bearer specified
                 raise HTTPException(status_code=403, detail="Invalid authentication scheme.")
 
-            # decode and validate the JWT auth token
-            if not self.sec.decode_jwt(auth.credentials):
-                raise HTTPException(status_code=403, detail="Invalid authentication token.")
+            # if this token was not recently validated
+            if not self.is_token_cached(auth.credentials):
+                # decode and validate the JWT auth token
+                if not self.sec.decode_jwt(auth.credentials):
+                    raise HTTPException(status_code=403, detail="Invalid authentication token.")
+
+                # save the validated token
+                self.cache_token(auth.credentials)
 
             # return the JWT creds
             return auth.credentials
+
+    def is_token_cached(self, token: str) -> bool:
+        """
+        checks to see if the token was validated and has not expired
+
+        :param token:
+        :return:
+        """
+        # get the expiration time of the token
+        expires_at: float = self.valid_token_cache.get(token)
+
+        # return true if we have a token that has not expired
+        return expires_at is not None and expires_at > time.time()
+
+    def cache_token(self, token: str):
+        """
+        saves a validated token. the token is trusted until the cache TTL or its own expiration, whichever comes first.
+
+        :param token:
+        :return:
+        """
+        # get the time the cached token expires
+        expires_at: float = time.time() + self.token_cache_ttl
+
+        # get the expiration claim, if any. the token has already been verified
+        token_exp = jwt.decode(token, options={'verify_signature': False}).get('exp')
+
+        # use the token expiration if it is sooner
+        if token_exp is not None:
+            expires_at = min(expires_at, float(token_exp))
+
+        # if the cache is full
+        if len(self.valid_token_cache) >= self.token_cache_size:
+            # get the current time
+            now: float = time.time()
+
+            # remove the expired tokens
+            for expired in [key for key, value in self.valid_token_cache.items() if value <= now]:
+                self.valid_token_cache.pop(expired, None)
+
+            # if it is still full, start over
+            if len(self.valid_token_cache) >= self.token_cache_size:
+                self.valid_token_cache.clear()
+
+        # save the token
+        self.valid_token_cache[token] = expires_at
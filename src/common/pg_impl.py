@@ -7,7 +7,13 @@
 
     Author: Phil Owen, RENCI.org
 """
-import json
+import os
+
+from types import MappingProxyType
+
+import orjson
+
+from cachetools import TTLCache
 
 from src.common.pg_utils_multi import PGUtilsMultiConnect
 from src.common.logger import LoggingUtil
@@ -18,10 +24,16 @@ class PGImplementation(PGUtilsMultiConnect):
         Class that contains DB calls for the Settings app.
 
         Note this class inherited from the PGUtilsMultiConnect class
-        which has all the connection and cursor handling.
+        which has all the connection pool handling.
     """
+    # declare the name of the DB that all the queries run against
+    db_name: str = 'irods-sv'
 
-    def __init__(self, db_names: tuple, _logger=None, _auto_commit=True):
+    # declare the default (job id, next job type id) pairs in sequence for each workflow type
+    workflow_job_types: MappingProxyType = MappingProxyType({'CORE': ((1, 2), (2, 3)), 'FEDERATION': ((1, 2), (2, 3)), 'PLUGIN': ((1, 2), (2, 3)),
+                                                             'TOPOLOGY': ((1, 2), (2, 3)), 'UNIT': ((1, 2), (2, 3))})
+
+    def __init__(self, db_names: tuple, _logger=None):
         # if this is a reference to a logger passed in use it
         if _logger is not None:
             # get a handle to a logger
@@ -34,18 +46,57 @@ class PGImplementation(PGUtilsMultiConnect):
             self.logger = LoggingUtil.init_logging("iRODS.Settings.PGImplementation", level=log_level, line_format='medium', log_file_path=log_path)
 
         # init the base class
-        PGUtilsMultiConnect.__init__(self, 'iRODS.Settings', db_names, _logger=self.logger, _auto_commit=_auto_commit)
+        PGUtilsMultiConnect.__init__(self, 'iRODS.Settings', db_names, _logger=self.logger)
+
+        # create a short-lived cache for the results of the lookup (read-only) queries
+        self.read_cache: TTLCache = TTLCache(maxsize=32, ttl=float(os.getenv('LOOKUP_CACHE_TTL', '30')))
+
+    async def get_cached_sql(self, cache_key: str, sql: str, *args, prep_data=None):
+        """
+        gets the results of a read-only query from the cache, or from the DB on a cache miss
+
+        :param cache_key:
+        :param sql:
+        :param args:
+        :param prep_data: an optional function that readies good results from the DB before they are cached
+        :return:
+        """
+        # get the cached data, if any
+        ret_val = self.read_cache.get(cache_key)
+
+        # if it was not found in the cache
+        if ret_val is None:
+            # get the data
+            ret_val = await self.exec_sql(self.db_name, sql, *args)
+
+            # save good results for the next caller
+            if ret_val != -1:
+                # get the data ready if needed
+                if prep_data is not None:
+                    ret_val = prep_data(ret_val)
 
-    def __del__(self):
+                self.read_cache[cache_key] = ret_val
+
+        # return the data
+        return ret_val
+
+    def clear_read_cache(self, *cache_keys: str):
         """
-        Calls super base class to clean up DB connections and cursors.
+        removes cached query results. this should be called after data in the DB has been modified.
 
+        :param cache_keys: the cached results to remove. all the results are removed if none are specified
         :return:
         """
-        # clean up connections and cursors
-        PGUtilsMultiConnect.__del__(self)
+        # if specific results were targeted
+        if cache_keys:
+            # remove each one
+            for cache_key in cache_keys:
+                self.read_cache.pop(cache_key, None)
+        else:
+            # clear the cache
+            self.read_cache.clear()
 
-    def get_environment_type_names(self):
+    async def get_environment_type_names(self):
         """
         gets the test environment types
 
@@ -56,12 +107,12 @@ class PGImplementation(PGUtilsMultiConnect):
         sql: str = "SELECT public.get_environment_type_names_json();"
 
         # get the data
-        ret_val = self.exec_sql('irods-sv', sql)
+        ret_val = await self.get_cached_sql('get_environment_type_names', sql)
 
         # return the data
         return ret_val
 
-    def get_test_names(self):
+    async def get_test_names(self):
         """
         gets the test names
 
@@ -72,12 +123,40 @@ class PGImplementation(PGUtilsMultiConnect):
         sql: str = "SELECT public.get_test_names_json();"
 
         # get the data
-        ret_val = self.exec_sql('irods-sv', sql)
+        ret_val = await self.get_cached_sql('get_test_names', sql)
+
+        # return the data
+        return ret_val
+
+    async def get_long_running_test_names(self):
+        """
+        gets the set of test names that are long-running
+
+        :return:
+        """
+
+        # get the test names. this is usually a cache hit
+        ret_val = await self.get_test_names()
+
+        # if the test names were found
+        if ret_val != -1:
+            # get the cached set, along with the test names it was built from
+            test_list, long_running_tests = self.read_cache.get('get_long_running_test_names', (None, None))
+
+            # if the set was not built from the current test names
+            if test_list is not ret_val:
+                # build the set of long-running test names
+                long_running_tests = frozenset(el['label'] for el in ret_val if el['description'] == 'L')
+
+                # save it for the next caller
+                self.read_cache['get_long_running_test_names'] = (ret_val, long_running_tests)
+
+            ret_val = long_running_tests
 
         # return the data
         return ret_val
 
-    def get_dbms_image_names(self):
+    async def get_dbms_image_names(self):
         """
         gets the DBMS image names
 
@@ -88,12 +167,12 @@ class PGImplementation(PGUtilsMultiConnect):
         sql: str = "SELECT public.get_dbms_image_names_json();"
 
         # get the data
-        ret_val = self.exec_sql('irods-sv', sql)
+        ret_val = await self.get_cached_sql('get_dbms_image_names', sql)
 
         # return the data
         return ret_val
 
-    def get_os_image_names(self):
+    async def get_os_image_names(self):
         """
         gets the os image names
 
@@ -104,12 +183,12 @@ class PGImplementation(PGUtilsMultiConnect):
         sql: str = "SELECT public.get_os_image_names_json();"
 
         # get the data
-        ret_val = self.exec_sql('irods-sv', sql)
+        ret_val = await self.get_cached_sql('get_os_image_names', sql)
 
         # return the data
         return ret_val
 
-    def get_test_request_names(self):
+    async def get_test_request_names(self):
         """
         gets the irods test request names
 
@@ -120,12 +199,12 @@ class PGImplementation(PGUtilsMultiConnect):
         sql: str = "SELECT public.get_test_request_names_json();"
 
         # get the data
-        ret_val = self.exec_sql('irods-sv', sql)
+        ret_val = await self.get_cached_sql('get_test_request_names', sql)
 
         # return the data
         return ret_val
 
-    def get_test_request_name_exists(self, request_name):
+    async def get_test_request_name_exists(self, request_name):
         """
         gets true/false if the request name already exists
 
@@ -133,15 +212,15 @@ class PGImplementation(PGUtilsMultiConnect):
         """
 
         # create the sql
-        sql: str = f"SELECT public.get_test_request_name_exists('{request_name}');"
+        sql: str = "SELECT public.get_test_request_name_exists($1);"
 
         # get the data
-        ret_val = self.exec_sql('irods-sv', sql)
+        ret_val = await self.exec_sql(self.db_name, sql, request_name)
 
         # return the data
         return ret_val
 
-    def get_run_status(self, request_group):
+    async def get_run_status(self, request_group):
         """
         gets the run status
 
@@ -149,101 +228,182 @@ class PGImplementation(PGUtilsMultiConnect):
         """
 
         # create the sql
-        sql: str = f"SELECT public.get_run_status_json('{request_group}');"
+        sql: str = "SELECT public.get_run_status_json($1);"
 
         # get the data
-        ret_val = self.exec_sql('irods-sv', sql)
+        ret_val = await self.exec_sql(self.db_name, sql, request_group)
 
         # return the data
         return ret_val
 
-    def insert_superv_request(self, status: str, request_data: dict, request_group: str):
+    async def insert_superv_requests(self, status: str, base_request_data: dict, test_groups: list, request_group: str) -> int:
         """
-        inserts a request record into the database
+        inserts a request record for each test group into the database in one transaction. either all the records are inserted or none are.
 
         :param status:
-        :param request_data:
+        :param base_request_data: the request data shared by all the records
+        :param test_groups: the tests for each record
         :param request_group:
 
-        :return:
+        :return: 0 on success, -1 on failure
         """
 
-        # create the sql
-        sql: str = (f"SELECT public.insert_request_item(_status:='{status}', _request_data:='{json.dumps(request_data)}', "
-                    f"_request_group:='{request_group}');")
+        # create the sql. this inserts a record for each of the request data items and returns true if all the inserts succeeded
+        sql: str = ("SELECT bool_and(public.insert_request_item(_status:=$1, _request_data:=req.request_data, _request_group:=$2) = 0) "
+                    "FROM unnest($3::text[]) AS req(request_data);")
 
-        # get the data
-        ret_val = self.exec_sql('irods-sv', sql)
+        # serialize the shared request data once, leaving the json object open so the tests can be added to it
+        request_data_prefix: bytes = orjson.dumps(base_request_data)[:-1] + (b',"tests":' if base_request_data else b'"tests":')
 
-        # return the data
+        # build up the request data for each record
+        request_data: list = [(request_data_prefix + orjson.dumps(test_group) + b'}').decode() for test_group in test_groups]
+
+        # init the return. the insert has failed until the records are committed
+        ret_val: int = -1
+
+        try:
+            # insert all the records in a transaction. it is committed when the block exits and rolled back on an exception
+            async with self.get_connection(self.db_name) as conn, conn.transaction():
+                # insert the records. this returns -1 on an execution error
+                if await self.exec_sql(self.db_name, sql, status, request_group, request_data, conn=conn) is not True:
+                    # raise an error to roll back the transaction
+                    raise ValueError(f'Error inserting the {request_group} request records.')
+
+            # the records were committed
+            ret_val = 0
+
+        except ValueError as e:
+            self.logger.error('%s No records were inserted.', e)
+
+        # the request names have changed
+        self.clear_read_cache('get_test_request_names')
+
+        # return to the caller
         return ret_val
 
-    def get_job_defs(self):
+    async def get_job_defs(self, sv_versions: bool = False):
         """
-        gets the supervisor job definitions
+        gets the supervisor job definitions, or the summary of the SV component image versions in them
 
+        :param sv_versions: return the image versions of the steps of each workflow type rather than the job definitions
         :return:
         """
 
         # create the sql
         sql: str = 'SELECT public.get_supervisor_job_defs_json()'
 
-        # get the data
-        ret_val = self.exec_sql('irods-sv', sql)
+        # get the data. the command arrays are decoded once when the data is cached
+        ret_val = await self.get_cached_sql('get_job_defs', sql, prep_data=self.decode_job_defs)
+
+        # if the image version summary was requested and the job definitions were found
+        if sv_versions and ret_val != -1:
+            # get the cached summary, along with the job definitions it was built from
+            job_defs, summary = self.read_cache.get('get_job_defs.sv_versions', (None, None))
+
+            # if the summary was not built from the current job definitions
+            if job_defs is not ret_val:
+                # pull out the docker image version details for the steps of each workflow type
+                summary = {workflow_type_name: [{step_name: step_def['IMAGE']} for step in workflow_steps for step_name, step_def in step.items()]
+                           for workflow_type in ret_val for workflow_type_name, workflow_steps in workflow_type.items()}
+
+                # save it for the next caller
+                self.read_cache['get_job_defs.sv_versions'] = (ret_val, summary)
+
+            ret_val = summary
 
         # return the data
         return ret_val
 
-    def get_job_order(self, workflow_type: str):
+    @staticmethod
+    def decode_job_defs(job_defs: list) -> list:
+        """
+        decodes the job definition command arrays. they are stored in the DB as json strings
+
+        :param job_defs:
+        :return:
+        """
+        # the data is checked by the caller. leave anything that is not a list of workflow types alone
+        if isinstance(job_defs, list):
+            # for each workflow type
+            for workflow_item in job_defs:
+                # for each job def in the workflow
+                for job_item in next(iter(workflow_item.values())):
+                    # get the job def details
+                    job_def: dict = next(iter(job_item.values()))
+
+                    # decode the arrays, if they have not been already
+                    for key in ('COMMAND_LINE', 'COMMAND_MATRIX', 'PARALLEL'):
+                        if isinstance(job_def.get(key), str):
+                            job_def[key] = orjson.loads(job_def[key])
+
+        # return the data
+        return job_defs
+
+    async def get_job_order(self, workflow_type: str, conn=None):
         """
         gets the supervisor job order
 
+        the job order is not cached. it is modified by this service, and a cached copy in one worker process
+        would not see the changes made by the others.
+
+        :param workflow_type:
+        :param conn: an optional connection already acquired from the pool (e.g. one in a transaction)
         :return:
         """
         # create the sql
-        sql: str = f"SELECT public.get_supervisor_job_order('{workflow_type}')"
+        sql: str = "SELECT public.get_supervisor_job_order($1)"
 
         # get the data
-        ret_val = self.exec_sql('irods-sv', sql)
+        ret_val = await self.exec_sql(self.db_name, sql, workflow_type, conn=conn)
 
         # return the data
         return ret_val
 
-    def reset_job_order(self, workflow_type_name: str) -> bool:
+    async def reset_job_order(self, workflow_type_name: str) -> tuple:
         """
         resets the supervisor job order to the default
 
-        :return:
+        :param workflow_type_name:
+        :return: a (failed, new job order) tuple. failed is False on success, True on failure
         """
 
-        # declare an array of the job id and next job type id in sequence
-        workflow_job_types: dict = {'CORE': ['1, 2', '2, 3'], 'FEDERATION': ['1, 2', '2, 3'], 'PLUGIN': ['1, 2', '2, 3'],
-                                    'TOPOLOGY': ['1, 2', '2, 3'], 'UNIT': ['1, 2', '2, 3']}
+        # get the job id/next job type id pairs as sql values, e.g. (1, 2), (2, 3)
+        job_values: str = ', '.join(f'({job_id}, {next_job_id})' for job_id, next_job_id in self.workflow_job_types[workflow_type_name])
+
+        # build the sql to do all the updates in one round-trip. any update that does not return 0 is an error
+        sql = (f"SELECT bool_or(COALESCE(public.update_next_job_for_job(job_id, next_job_id, $1::text) <> 0, TRUE)) "
+               f"FROM (VALUES {job_values}) AS job_order(job_id, next_job_id)")
+
+        # init the return. the reset has failed until the updates are committed
+        failed: bool = True
 
-        # init the failed flag
-        failed: bool = False
+        # init the new job order
+        job_order = -1
 
-        # for each job entry
-        for item in workflow_job_types[workflow_type_name]:
-            # build the update sql
-            sql = f"SELECT public.update_next_job_for_job({item}, '{workflow_type_name}')"
+        try:
+            # run the updates and get the new job order in a transaction. it is committed when the block exits and rolled back on an exception
+            async with self.get_connection(self.db_name) as conn, conn.transaction():
+                # execute the updates. this returns false if all updates succeeded, -1 on an execution error
+                if await self.exec_sql(self.db_name, sql, workflow_type_name, conn=conn) is not False:
+                    # raise an error to roll back the transaction
+                    raise ValueError(f'Error updating the {workflow_type_name} job order.')
 
-            # and execute it
-            ret_val = self.exec_sql('irods-sv', sql)
+                # get the new job order on the same connection
+                job_order = await self.get_job_order(workflow_type_name, conn=conn)
 
-            # anything other than a list returned is an error
-            if ret_val != 0:
-                failed = True
-                break
+            # the updates were committed
+            failed = False
 
-        # if there were no errors, commit the updates
-        if not failed:
-            self.commit('irods-sv')
+        except ValueError as e:
+            self.logger.error('%s The job order was not reset.', e)
+
+        # set the return
+        ret_val: tuple = (failed, job_order)
 
         # return to the caller
-        return failed
+        return ret_val
 
-    def get_run_list(self):
+    async def get_run_list(self):
         """
         gets the last 100 job runs
 
@@ -254,29 +414,51 @@ class PGImplementation(PGUtilsMultiConnect):
         sql: str = 'SELECT public.get_supervisor_run_list()'
 
         # return the data
-        return self.exec_sql('irods-sv', sql)
+        return await self.exec_sql(self.db_name, sql)
 
-    def update_next_job_for_job(self, job_name: str, next_process_id: int, workflow_type_name: str):
+    async def update_next_job_for_job(self, job_name: str, next_process_id: int, workflow_type_name: str) -> tuple:
         """
         Updates the next job process id for a job
 
         :param job_name:
         :param next_process_id:
         :param workflow_type_name:
-        :return: nothing
+        :return: a (failed, new job order) tuple. failed is False on success, True on failure
         """
 
         # create the sql
-        sql = f"SELECT public.update_next_job_for_job('{job_name}', {next_process_id}, '{workflow_type_name}')"
+        sql = "SELECT public.update_next_job_for_job($1::text, $2::integer, $3::text)"
+
+        # init the return. the update has failed until it is committed
+        failed: bool = True
 
-        # run the SQL
-        ret_val = self.exec_sql('irods-sv', sql)
+        # init the new job order
+        job_order = -1
 
-        # if there were no errors, commit the updates
-        if ret_val > -1:
-            self.commit('irods-sv')
+        try:
+            # run the update and get the new job order in a transaction. it is committed when the block exits and rolled back on an exception
+            async with self.get_connection(self.db_name) as conn, conn.transaction():
+                # execute the update. this returns 0 on success, -1 on an execution error
+                if await self.exec_sql(self.db_name, sql, job_name, next_process_id, workflow_type_name, conn=conn) != 0:
+                    # raise an error to roll back the transaction
+                    raise ValueError(f'Error updating the {workflow_type_name} {job_name} next job.')
 
-    def update_job_image_version(self, job_name: str, image: str):
+                # get the new job order on the same connection
+                job_order = await self.get_job_order(workflow_type_name, conn=conn)
+
+            # the update was committed
+            failed = False
+
+        except ValueError as e:
+            self.logger.error('%s The next job was not changed.', e)
+
+        # set the return
+        ret_val: tuple = (failed, job_order)
+
+        # return to the caller
+        return ret_val
+
+    async def update_job_image_version(self, job_name: str, image: str):
         """
         Updates the image version
 
@@ -286,16 +468,15 @@ class PGImplementation(PGUtilsMultiConnect):
         """
 
         # create the sql
-        sql = f"SELECT public.update_job_image('{job_name}', '{image}')"
+        sql = "SELECT public.update_job_image($1, $2)"
 
-        # run the SQL
-        ret_val = self.exec_sql('irods-sv', sql)
+        # run the SQL. the pool connections auto-commit
+        await self.exec_sql(self.db_name, sql, job_name, image)
 
-        # if there were no errors, commit the updates
-        if ret_val > -1:
-            self.commit('irods-sv')
+        # the job definitions have changed
+        self.clear_read_cache('get_job_defs', 'get_job_defs.sv_versions')
 
-    def update_run_status(self, run_id: int, status: str):
+    async def update_run_status(self, run_id: int, status: str):
         """
         Updates the run properties run status to 'new'.
 
@@ -306,33 +487,29 @@ class PGImplementation(PGUtilsMultiConnect):
         """
 
         # create the sql
-        sql = f"SELECT public.set_config_item({run_id}, 'supervisor_job_status', '{status}')"
-
-        # run the SQL
-        ret_val = self.exec_sql('irods-sv', sql)
+        sql = "SELECT public.set_config_item($1, 'supervisor_job_status', $2)"
 
-        # if there were no errors, commit the updates
-        if ret_val > -1:
-            self.commit('irods-sv')
+        # run the SQL. the pool connections auto-commit
+        await self.exec_sql(self.db_name, sql, run_id, status)
 
-    def get_run_props(self, run_id: int):
+    async def get_run_props(self, run_id: int):
         """
         gets the run properties for a run
 
         :return:
         """
         # create the sql
-        sql: str = f"SELECT * FROM public.get_run_prop_items_json({run_id})"
+        sql: str = "SELECT * FROM public.get_run_prop_items_json($1)"
 
         # get the data
-        ret_val = self.exec_sql('irods-sv', sql)
+        ret_val = await self.exec_sql(self.db_name, sql, run_id)
 
         # check the result
         if ret_val == -1:
             ret_val = ['Run not found']
         else:
             # replace with the data sorted by keys
-            ret_val[0]['run_data'] = {x: ret_val[0]['run_data'][x] for x in sorted(ret_val[0]['run_data'])}
+            ret_val[0]['run_data'] = dict(sorted(ret_val[0]['run_data'].items()))
 
         # return the data
         return ret_val[0]
@@ -9,10 +9,11 @@
 """
 
 import os
-import time
+import asyncio
 from collections import namedtuple
 
-import psycopg2
+import asyncpg
+import orjson
 
 from src.common.logger import LoggingUtil
 
@@ -21,17 +22,20 @@ class PGUtilsMultiConnect:
     """
         Base class for database functionalities.
 
-        This class supports setting up connections to multiple databases. To do that
+        This class supports setting up connection pools to multiple databases. To do that
         the class relies on environment parameter names that adhere to a specific
         naming convention. e.g. <DB name>_DB_<parameter name>. Note that the
         final environment parameter should be all uppercase.
 
         Please see the get_conn_config() method below for more details.
+
+        Note that the connection pools are created asynchronously, so open_pools() must be
+        awaited (typically at application startup) before any SQL is executed.
     """
 
-    def __init__(self, app_name, db_names: tuple, _logger=None, _auto_commit=True):
+    def __init__(self, app_name, db_names: tuple, _logger=None):
         """
-        Entry point for the db connection creation and operations
+        Entry point for the db connection pool creation and operations
 
         :param db_names:
         """
@@ -49,57 +53,62 @@ class PGUtilsMultiConnect:
         # create a dict for the DB connection details
         self.dbs: dict = {}
 
-        # set the autocommit
-        self.auto_commit = _auto_commit
-
         # create the named tuple definition for DB info
-        self.db_info_tpl: namedtuple = namedtuple('DB_Info', ['name', 'conn_str', 'conn'])
+        self.db_info_tpl: namedtuple = namedtuple('DB_Info', ['name', 'conn_config', 'pool'])
 
-        # save the DB names for connection/cursor closing on class tear-down
+        # save the DB names for connection pool closing on class tear-down
         self.db_names: tuple = db_names
 
         # get the details loaded into a tuple for all the DBs
         for db_name in self.db_names:
-            # get the connection string
+            # get the connection configuration
             conn_config = self.get_conn_config(db_name)
 
-            # create a temporary tuple to get the discovery process started
-            temp_tuple: namedtuple = self.db_info_tpl(db_name, conn_config, None)
+            # save a tuple to get the discovery process started. the pool gets created in open_pools()
+            self.dbs.update({db_name: self.db_info_tpl(db_name, conn_config, None)})
 
-            # get the connection
-            self.get_db_connection(temp_tuple)
+    async def open_pools(self):
+        """
+        Creates the DB connection pools
 
-    def __del__(self):
+        :return:
         """
-        Close up the DB connections and cursors
+        # for each db name specified
+        for db_name in self.db_names:
+            # get the connection pool
+            await self.get_db_pool(self.dbs[db_name])
+
+    async def close_pools(self):
+        """
+        Closes up the DB connection pools
 
         :return:
         """
         # for each db name specified
         for db_name in self.db_names:
-            # close the connection
-            self.close_conn(db_name)
+            # close the connection pool
+            await self.close_pool(db_name)
 
-    def close_conn(self, db_name):
+    async def close_pool(self, db_name):
         """
-        Closes a DB connection
+        Closes a DB connection pool
 
         :param db_name:
         :return:
         """
         try:
-            # if there is a connection, close it
-            if self.dbs[db_name].conn is not None:
+            # if there is a connection pool, close it
+            if self.dbs[db_name].pool is not None:
                 # get the item out of the tuple
-                conn = self.dbs[db_name].conn
+                pool = self.dbs[db_name].pool
 
                 # close it
-                conn.close()
+                await pool.close()
         except Exception:
-            self.logger.warning('Error detected closing the %s DB connection.', db_name)
+            self.logger.warning('Error detected closing the %s DB connection pool.', db_name)
 
     @staticmethod
-    def get_conn_config(db_name: str) -> str:
+    def get_conn_config(db_name: str) -> dict:
         """
         Creates a dict of the DB connection configuration.
 
@@ -116,15 +125,71 @@ class PGUtilsMultiConnect:
         host: str = os.environ.get(f'{db_name}_DB_HOST')
         port: int = int(os.environ.get(f'{db_name}_DB_PORT'))
 
-        # create a connection string
-        connection_str: str = f"host={host} port={port} dbname={dbname} user={user} password={password}"
+        # get the number of prepared statements cached per connection. the queries in this app are fixed, so each
+        # one is parsed and planned once per connection. set to 0 if the DB is behind a transaction pooling proxy.
+        statement_cache_size: int = int(os.environ.get(f'{db_name}_DB_STATEMENT_CACHE_SIZE', '100'))
+
+        # get the JIT compilation setting for the session. the queries in this app are small, so JIT only adds planning time
+        jit: str = os.environ.get(f'{db_name}_DB_JIT', 'off')
+
+        # create the connection configuration
+        connection_config: dict = {'host': host, 'port': port, 'database': dbname, 'user': user, 'password': password,
+                                   'statement_cache_size': statement_cache_size, 'server_settings': {'jit': jit}}
+
+        # return to the caller
+        return connection_config
+
+    @staticmethod
+    def get_pool_config(db_name: str) -> dict:
+        """
+        Creates a dict of the DB connection pool size configuration.
+
+        The max pool size should be at least the expected number of concurrent requests per worker. Idle
+        connections above the min pool size are closed after the max inactive lifetime (in seconds).
+
+        :param db_name:
+        :return:
+        """
+        # insure the env parameter prefix is uppercase
+        db_name: str = db_name.upper().replace('-', '_')
+
+        # get the pool size params from the env params
+        min_size: int = int(os.environ.get(f'{db_name}_DB_POOL_MIN_SIZE', '5'))
+        max_size: int = int(os.environ.get(f'{db_name}_DB_POOL_MAX_SIZE', '25'))
+        max_inactive_lifetime: float = float(os.environ.get(f'{db_name}_DB_POOL_MAX_INACTIVE_LIFETIME', '600'))
 
         # return to the caller
-        return connection_str
+        return {'min_size': min_size, 'max_size': max(min_size, max_size), 'max_inactive_connection_lifetime': max_inactive_lifetime}
+
+    @staticmethod
+    def encode_json(value) -> str:
+        """
+        Encodes a json/jsonb SQL parameter. Values that are already serialized are passed through as-is.
+
+        :param value:
+        :return:
+        """
+        # return the serialized value
+        return value if isinstance(value, str) else orjson.dumps(value).decode()
 
-    def get_db_connection(self, db_info: namedtuple) -> bool:
+    async def init_connection(self, conn: asyncpg.Connection):
         """
-        Gets a connection to the DB. performs a check to continue trying until
+        Initializes each new connection in the pool.
+
+        asyncpg returns json data types as strings, so codecs are registered here
+        to decode them into python objects. orjson is used as it is much faster than
+        the json module on the larger documents (e.g. the job definitions).
+
+        :param conn:
+        :return:
+        """
+        # decode json and jsonb data types into python objects
+        for data_type in ('json', 'jsonb'):
+            await conn.set_type_codec(data_type, encoder=self.encode_json, decoder=orjson.loads, schema='pg_catalog')
+
+    async def get_db_pool(self, db_info: namedtuple) -> bool:
+        """
+        Gets a connection pool to the DB. performs a check to continue trying until
         a connection is made.
 
         :return:
@@ -135,48 +200,43 @@ class PGUtilsMultiConnect:
         # until forever
         while not good_conn:
             try:
-                # check the DB connection
-                good_conn = self.check_db_connection(db_info)
+                # try to create a connection pool to the DB
+                pool = await asyncpg.create_pool(**db_info.conn_config, **self.get_pool_config(db_info.name), init=self.init_connection)
 
-                # try to get a connection if the check failed
-                if not good_conn:
-                    # try to connect to the DB
-                    conn = psycopg2.connect(db_info.conn_str)
+                # create a new db info tuple
+                verified_tuple: namedtuple = self.db_info_tpl(db_info.name, db_info.conn_config, pool)
 
-                    # set the autocommit on the connection
-                    conn.autocommit = self.auto_commit
+                # check the new DB connection pool
+                good_conn = await self.check_db_connection(verified_tuple)
 
-                    # create a new db info tuple
-                    verified_tuple: namedtuple = self.db_info_tpl(db_info.name, db_info.conn_str, conn)
-
-                    # check the new DB connection
-                    good_conn = self.check_db_connection(verified_tuple)
+                # is the connection ok now?
+                if not good_conn:
+                    self.logger.warning('DB Connection pool not established to %s.', db_info.name)
 
-                    # is the connection ok now?
-                    if not good_conn:
-                        self.logger.warning('DB Connection not established (auto commit %s) to %s.', self.auto_commit, db_info.name)
-                    else:
-                        self.logger.debug('DB Connection established (auto commit %s) to %s.', self.auto_commit, db_info.name)
+                    # clean up the pool before retrying
+                    await pool.close()
+                else:
+                    self.logger.debug('DB Connection pool established to %s.', db_info.name)
 
-                        # add the verified connection to the dict
-                        self.dbs.update({db_info.name: verified_tuple})
+                    # add the verified connection pool to the dict
+                    self.dbs.update({db_info.name: verified_tuple})
 
-                        # no need to continue
-                        break
+                    # no need to continue
+                    break
 
             except Exception:
-                self.logger.exception('Error getting connection %s.', db_info.name)
+                self.logger.exception('Error getting connection pool %s.', db_info.name)
                 good_conn = False
 
             # are we still looking for a connection
             if good_conn is False:
                 self.logger.error('DB Connection failed to %s. Retrying...', db_info.name)
-                time.sleep(5)
+                await asyncio.sleep(5)
 
         # return pass/fail flag
         return good_conn
 
-    def check_db_connection(self, db_info: namedtuple) -> bool:
+    async def check_db_connection(self, db_info: namedtuple) -> bool:
         """
         Checks to see if there is a good connection to the DB.
 
@@ -186,36 +246,27 @@ class PGUtilsMultiConnect:
         # init the return value
         ret_val = None
 
-        # init the cursor storage
-        cursor = None
-
         try:
-            # is there an existing connection
-            if not db_info.conn:
-                self.logger.debug('Existing DB connection not found for %s', db_info.name)
+            # is there an existing connection pool
+            if not db_info.pool:
+                self.logger.debug('Existing DB connection pool not found for %s', db_info.name)
 
-                # force getting a new connection
+                # force getting a new connection pool
                 ret_val = False
             else:
-                # get the cursor
-                cursor = db_info.conn.cursor()
-
                 # get the DB version
-                cursor.execute("SELECT version()")
-
-                # get the value
-                db_version = cursor.fetchone()
+                db_version = await db_info.pool.fetchval("SELECT version()")
 
                 # set the success (or not) flag
                 ret_val = bool(db_version)
 
-        except psycopg2.DatabaseError:
+        except asyncpg.PostgresError:
             self.logger.debug('Error database error checking DB connection.')
 
             # connection failed
             ret_val = False
 
-        except psycopg2.InterfaceError:
+        except asyncpg.InterfaceError:
             self.logger.debug('Error database interface error checking DB connection.')
 
             # connection failed
@@ -230,75 +281,53 @@ class PGUtilsMultiConnect:
         # return to the caller
         return ret_val
 
-    def exec_sql(self, db_name: str, sql_stmt: str):
+    def get_connection(self, db_name: str):
+        """
+        Gets a connection from the DB connection pool.
+
+        This is intended to be used as an async context manager, e.g.
+        "async with self.get_connection(db_name) as conn:". The
+        connection is returned to the pool when the block exits.
+
+        :param db_name:
+        :return:
+        """
+        # return the pool acquire context
+        return self.dbs[db_name].pool.acquire()
+
+    async def exec_sql(self, db_name: str, sql_stmt: str, *args, conn: asyncpg.Connection = None):
         """
         Executes a sql statement.
 
         :param db_name:
-        :param sql_stmt:
+        :param sql_stmt: the sql, using positional ($1, $2, ...) parameters
+        :param args: the sql parameter values
+        :param conn: an optional connection already acquired from the pool (e.g. one in a transaction)
         :return:
         """
         # init the return
         ret_val = None
 
-        # get the appropriate db info object
-        db_info = self.dbs[db_name]
-
-        # insure we have a valid DB connection
-        success = self.get_db_connection(db_info)
-
-        # did we get a connection
-        if success:
-            # init the cursor
-            cursor = None
-
-            try:
-                # make sure the latest db_info is used
-                db_info = self.dbs[db_name]
-
-                # get a cursor
-                cursor = db_info.conn.cursor()
-
-                # execute the sql
-                cursor.execute(sql_stmt)
-
-                # get the returned value
-                ret_val = cursor.fetchone()
-
-                # trap the return
-                if ret_val is None or ret_val[0] is None:
-                    # specify a return code on an empty result
-                    ret_val = -1
-                else:
-                    # get the one and only record of json
-                    ret_val = ret_val[0]
-
-            except Exception:
-                self.logger.exception("Error detected executing SQL: %s.", sql_stmt)
+        try:
+            # if a connection was not passed in, get one from the pool
+            if conn is None:
+                async with self.get_connection(db_name) as pool_conn:
+                    # execute the sql and get the returned value
+                    ret_val = await pool_conn.fetchval(sql_stmt, *args)
+            else:
+                # execute the sql and get the returned value
+                ret_val = await conn.fetchval(sql_stmt, *args)
 
-                # set the error code
+            # trap the return
+            if ret_val is None:
+                # specify a return code on an empty result
                 ret_val = -1
-            finally:
-                # in there is a cursor, close it
-                if cursor is not None:
-                    # close it
-                    cursor.close()
 
-        else:
+        except Exception:
+            self.logger.exception("Error detected executing SQL: %s, params: %s.", sql_stmt, args)
+
             # set the error code
             ret_val = -1
 
         # return to the caller
         return ret_val
-
-    def commit(self, db_name: str):
-        """
-        issues a transaction commit
-
-        :param db_name:
-        :return:
-        """
-        # if this connection is set to not auto commit
-        if not self.dbs[db_name].conn.autocommit:
-            # issue the commit
-            self.dbs[db_name].conn.commit()
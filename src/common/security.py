@@ -43,6 +43,35 @@ class Security:
         self.jwt_algorithm = os.environ.get('JWT_ALGORITHM')
         self.jwt_secret = os.environ.get('JWT_SECRET')
 
+        # the list of algorithms allowed when decoding a token
+        self.jwt_algorithms: list = [self.jwt_algorithm]
+
+        # resolve the token verification key once. for asymmetric algorithms this
+        # avoids parsing the PEM key on every decode.
+        self.jwt_decode_key = self.get_decode_key()
+
+    def get_decode_key(self):
+        """
+        gets the prepared key used to verify token signatures
+
+        :return:
+        """
+        # init the return
+        ret_val = self.jwt_secret
+
+        try:
+            # if the JWT params were declared
+            if self.jwt_algorithm and self.jwt_secret:
+                # get the key object for the algorithm
+                ret_val = jwt.get_algorithm_by_name(self.jwt_algorithm).prepare_key(self.jwt_secret)
+
+        except Exception:
+            # leave the raw secret in place, the decode will report any key issues
+            ret_val = self.jwt_secret
+
+        # return to the caller
+        return ret_val
+
     def sign_jwt(self, token_def: dict):
         """
         creates and returns a signed token
@@ -67,7 +96,7 @@ class Security:
 
         try:
             # try to decode the token passed
-            decoded_token = jwt.decode(token, self.jwt_secret, algorithms=[self.jwt_algorithm])
+            decoded_token = jwt.decode(token, self.jwt_decode_key, algorithms=self.jwt_algorithms)
 
             # verify that the token is legit
             if 'bearer_name' in decoded_token and decoded_token['bearer_name'] == self.bearer_name and 'bearer_secret' in decoded_token and \
@@ -9,9 +9,13 @@
 """
 
 import os
+import re
+import time
+import fnmatch
+import functools
 
-from pathlib import Path
 from enum import Enum
+from types import MappingProxyType
 from src.common.logger import LoggingUtil
 from src.common.pg_impl import PGImplementation
 
@@ -21,45 +25,93 @@ class GenUtils:
     General utilities
 
     """
-    # declare the two potential image repos
-    image_repo_to_repo_name: dict = {'renciorg': 'renciorg', 'containers.renci.org': 'containers.renci.org/eds'}
+    # declare the two potential image repos. these lookups are read-only
+    image_repo_to_repo_name: MappingProxyType = MappingProxyType({'renciorg': 'renciorg', 'containers.renci.org': 'containers.renci.org/eds'})
 
     # declare the component job type image name
-    job_type_to_image_name: dict = {}
+    job_type_to_image_name: MappingProxyType = MappingProxyType({})
 
-    # declare job name to id
-    job_type_name_to_id: dict = {}
+    # declare job name to id. this is filled in below, once the job type names are declared
+    job_type_name_to_id: MappingProxyType = MappingProxyType({})
+
+    # declare the path to the file that indicates we are in image freeze mode
+    freeze_file_path: str = os.path.join(os.path.dirname(__file__), '../', str('freeze'))
+
+    # declare the last freeze status check (time checked, freeze mode)
+    freeze_status: tuple = (None, False)
+
+    # declare how long (in seconds) a freeze status check is reused
+    freeze_status_ttl: float = 5.0
+
+    # declare the recent log file list results ((log file path, filter param): (time checked, log file list))
+    log_file_list_cache: dict = {}
+
+    # declare how long (in seconds) a log file list is reused
+    log_file_list_ttl: float = 5.0
+
+    # declare the max number of log file lists to keep
+    log_file_list_cache_size: int = 64
 
     @staticmethod
     def get_log_file_list(filter_param: str = ''):
         """
-        Gets all the log file path/names
+        Gets all the log file path/names. the list is reused for a few seconds so that repeated (polling) requests do not rescan
+        the log directory.
 
         :return:
         """
-        # init the return
-        ret_val = {}
-
-        # init a file counter
-        counter = 0
-
         # get the log file path
         log_file_path: str = LoggingUtil.get_log_path()
 
+        # get the cache key
+        cache_key: tuple = (log_file_path, filter_param)
+
+        # get the last scan details
+        checked_at, ret_val = GenUtils.log_file_list_cache.get(cache_key, (None, None))
+
+        # get the current time
+        now: float = time.monotonic()
+
+        # if the last scan has expired
+        if checked_at is None or now - checked_at >= GenUtils.log_file_list_ttl:
+            # scan the log directory
+            ret_val = GenUtils.scan_log_files(log_file_path, filter_param)
+
+            # start over if the cache is full
+            if len(GenUtils.log_file_list_cache) >= GenUtils.log_file_list_cache_size:
+                GenUtils.log_file_list_cache.clear()
+
+            # save the scan details
+            GenUtils.log_file_list_cache[cache_key] = (now, ret_val)
+
+        # return the list to the caller
+        return ret_val
+
+    @staticmethod
+    def scan_log_files(log_file_path: str, filter_param: str = ''):
+        """
+        Scans the log directory for all the log file path/names
+
+        :param log_file_path:
+        :param filter_param:
+        :return:
+        """
+        # get the length of the log file path (with a trailing separator) to remove from each file path
+        prefix_len: int = len(os.path.join(log_file_path, ''))
+
         # if a filter param was declared, make it a wildcard
         if filter_param:
             filter_param += '*'
 
-        # go through all the directories
-        for file_path in Path(log_file_path).rglob(f"*{filter_param}log*"):
-            # increment the counter
-            counter += 1
+        # get the compiled file name pattern
+        pattern: re.Pattern = GenUtils.get_file_name_pattern(f"*{filter_param}log*")
 
-            # clean up the file path. this is only relevant to windows paths
-            final_path = str(file_path).replace(log_file_path, "")
+        # go through all the directories and get the entries that match the pattern
+        entries = (entry for entry in GenUtils.scan_dir(log_file_path) if pattern.match(entry.name))
 
-            # save the absolute file path, endpoint URL, and file size in a dict
-            ret_val.update({f"{file_path.name}_{counter}": {'file_path': final_path[1:], 'file_size': f'{file_path.stat().st_size} bytes'}})
+        # save the relative file path and file size of each numbered entry in a dict
+        ret_val: dict = {f"{entry.name}_{counter}": {'file_path': entry.path[prefix_len:], 'file_size': f'{entry.stat().st_size} bytes'}
+                         for counter, entry in enumerate(entries, start=1)}
 
         # if nothing was found, return a message
         if len(ret_val) == 0 and filter_param:
@@ -68,33 +120,80 @@ class GenUtils:
         # return the list to the caller
         return ret_val
 
+    @staticmethod
+    @functools.lru_cache(maxsize=32)
+    def get_file_name_pattern(glob_pattern: str) -> re.Pattern:
+        """
+        Compiles a (case-sensitive) file name glob pattern. The compiled patterns are cached.
+
+        :param glob_pattern:
+        :return:
+        """
+        # return the compiled pattern
+        return re.compile(fnmatch.translate(glob_pattern))
+
+    @staticmethod
+    def scan_dir(dir_path: str):
+        """
+        Recursively yields the directory entries under the path passed.
+
+        The os.DirEntry objects carry the file type from the directory read, so no
+        extra stat() call is needed to decide what to recurse into.
+
+        :param dir_path:
+        :return:
+        """
+        # init a list of the subdirectories found
+        sub_dirs: list = []
+
+        # go through the entries in this directory
+        with os.scandir(dir_path) as entries:
+            for entry in entries:
+                # return the entry to the caller
+                yield entry
+
+                # save the subdirectories to scan next
+                if entry.is_dir(follow_symlinks=False):
+                    sub_dirs.append(entry.path)
+
+        # go through the subdirectories
+        for sub_dir in sub_dirs:
+            yield from GenUtils.scan_dir(sub_dir)
+
     @staticmethod
     def check_freeze_status() -> bool:
         """
-        checks to see if we are in image freeze mode.
+        checks to see if we are in image freeze mode. the result is reused for a few seconds to avoid a file system check on every call.
 
         """
-        # get the flag that indicates we are freezing the updating of image versions
-        freeze_mode: bool = os.path.exists(os.path.join(os.path.dirname(__file__), '../', str('freeze')))
+        # get the last check details
+        checked_at, freeze_mode = GenUtils.freeze_status
+
+        # get the current time
+        now: float = time.monotonic()
+
+        # if the last check has expired
+        if checked_at is None or now - checked_at >= GenUtils.freeze_status_ttl:
+            # get the flag that indicates we are freezing the updating of image versions
+            freeze_mode = os.path.exists(GenUtils.freeze_file_path)
+
+            # save the check details
+            GenUtils.freeze_status = (now, freeze_mode)
 
         # return to the caller
         return freeze_mode
 
     @staticmethod
-    def validate_settings_input(workflow_type, run_status, package_dir, tests, request_group, db_info) -> str:
+    async def validate_settings_input(package_dir, tests, request_group, db_info) -> str:
         """
         checks to see if the path passed exists or is using a default
 
+        note that the workflow type and run status are validated by FastAPI as enum path params.
+
         :return:
         """
         ret_val: list = []
 
-        if not workflow_type:
-            ret_val.append(['No workflow type found'])
-
-        if not run_status:
-            ret_val.append('No run status')
-
         if len(package_dir) != 0 and not os.path.exists(package_dir):
             ret_val.append('Invalid package directory')
 
@@ -105,7 +204,7 @@ class GenUtils:
             ret_val.append('No request group')
         else:
             # does the request group name already exist?
-            db_ret_val = db_info.get_test_request_name_exists(request_group)
+            db_ret_val = await db_info.get_test_request_name_exists(request_group)
 
             # check the results
             if db_ret_val < 0:
@@ -128,6 +227,10 @@ class WorkflowTypeName(str, Enum):
     UNIT = 'UNIT'
 
 
+# declare the set of valid test run locations
+RUN_LOCATIONS: frozenset = frozenset({'CONSUMER', 'PROVIDER'})
+
+
 class DBType(str, Enum):
     """
     Enum class for the various database types
@@ -148,16 +251,8 @@ class JobTypeName(str, Enum):
     CORE_FINAL_STAGING_JOB = 'core-final-staging-job'
 
 
-class NextJobTypeName(str, Enum):
-    """
-    Class enum for k8s job type names
-    """
-    CORE_STAGING_JOB = 'core-staging-job'
-    CORE_DATABASE_JOB = 'core-database-job'
-    CORE_PROVIDER_JOB = 'core-provider-job'
-    CORE_CONSUMER_JOB = 'core-consumer-job'
-    CORE_FORENSICS_JOB = 'core-forensics-job'
-    CORE_FINAL_STAGING_JOB = 'core-final-staging-job'
+# declare the job name to id lookup. the job type ids follow the job sequence, as in the default workflow job orders
+GenUtils.job_type_name_to_id = MappingProxyType({job_type.value: job_id for job_id, job_type in enumerate(JobTypeName, start=1)})
 
 
 class RunStatus(str, Enum):
@@ -6,40 +6,51 @@
     iRODS-K8s settings server.
 """
 
+import asyncio
+import hashlib
 import json
 import os
+import re
 import typing
 
-from itertools import batched
+from contextlib import asynccontextmanager
+from itertools import batched, chain
 
 from pathlib import Path
 from typing import Union
 
-from fastapi import FastAPI, Query, Depends
+import orjson
+
+from fastapi import FastAPI, Query, Depends, Request, Response
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, FileResponse
+from fastapi.routing import APIRoute
+from starlette.exceptions import HTTPException
 
 from src.common.logger import LoggingUtil
 from src.common.pg_impl import PGImplementation
-from src.common.utils import GenUtils, WorkflowTypeName, RunStatus, JobTypeName, NextJobTypeName, DBType
+from src.common.utils import GenUtils, WorkflowTypeName, RunStatus, JobTypeName, DBType, RUN_LOCATIONS
 from src.common.security import Security
 from src.common.bearer import JWTBearer
 
 # set the app version
 app_version = os.getenv('APP_VERSION', 'Version number not set')
 
-# declare the FastAPI details
-APP = FastAPI(title='iRODS-K8s Settings', version=app_version)
-
-# declare app access details
-APP.add_middleware(CORSMiddleware, allow_origins=['*'], allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
-
 # get the log level and directory from the environment.
 log_level, log_path = LoggingUtil.prep_for_logging()
 
 # create a logger
 logger = LoggingUtil.init_logging('iRODS.Settings', level=log_level, line_format='medium', log_file_path=log_path)
 
+# get the resolved log directory path once for the log file requests
+log_dir_path: str = os.path.realpath(log_path)
+
+# declare the pattern for a legit log file name, optionally in a subdirectory of the log directory, e.g. sub/iRODS.Settings.log.1.
+# parent directory (..) path segments are not allowed
+log_file_name_pattern: re.Pattern = re.compile(r'(?=.{1,255}$)(?!.*(?:^|/)\.\.(?:/|$))(?:[\w.-]+/){0,8}[\w.-]*log[\w.-]*')
+
 # specify the DB to get a connection
 # note the extra comma makes this single item a singleton tuple
 db_names: tuple = ('irods-sv',)
@@ -47,457 +58,426 @@ db_names: tuple = ('irods-sv',)
 # create a DB connection object
 db_info: PGImplementation = PGImplementation(db_names, _logger=logger)
 
-# create a DB connection object with auto-commit turned off
-db_info_no_auto_commit: PGImplementation = PGImplementation(db_names, _logger=logger, _auto_commit=False)
-
 # create a Security object
 security = Security()
 
-
-@APP.get('/get_sv_component_versions', dependencies=[Depends(JWTBearer(security))], status_code=200, response_model=None)
-async def get_sv_component_versions() -> json:
-    """
-    gets the SV image versions for this namespace
-
+# declare the failure message and response body format of each endpoint for when an unexpected exception is raised.
+# the messages may use the endpoint's path parameters
+endpoint_errors: dict = {
+    'get_sv_component_versions': ('Exception detected trying to get the component versions.', 'Error'),
+    'get_environment_type_names': ('Exception detected trying to get the environment types.', 'Error'),
+    'get_test_names': ('Exception detected trying to get the test names.', 'Error'),
+    'get_dbms_image_names': ('Exception detected trying to get the DBMS image names.', 'Error'),
+    'get_os_image_names': ('Exception detected trying to get the OS image names.', 'Error'),
+    'get_os_request_names': ('Exception detected trying to get the test request names.', 'Error'),
+    'get_run_status': ('Exception detected trying to get the run status.', 'List'),
+    'display_job_order': ('Exception detected trying to get the {workflow_type_name} job order.', 'Error'),
+    'reset_job_order': ('Exception detected trying to reset the {workflow_type_name} job order.', 'Error'),
+    'display_job_definitions': ('Exception detected trying to get the job definitions.', 'Error'),
+    'superv_workflow_request': ('Exception detected trying to generate a Superv workflow request.', 'Error'),
+    'set_the_run_status': ('Exception detected trying to update run {run_id} to {status}', 'Response'),
+    'set_the_supervisor_job_order': ('Exception detected trying to update the {workflow_type_name} next job name for {job_type_name}, '
+                                     'next job name: {next_job_type_name}', 'Response')}
+
+
+def endpoint_error_response(endpoint_name: str, request: Request) -> ORJSONResponse:
+    """
+    logs the exception being handled and creates the server error response for the endpoint
+
+    :param endpoint_name:
+    :param request:
     :return:
     """
+    # get the failure message and body format for the endpoint. other endpoints get a general message
+    msg_format, body_format = endpoint_errors.get(endpoint_name, ('Exception detected processing the {request_path} request.', 'Error'))
 
-    # init the returned html status code
-    status_code: int = 200
-    ret_val: dict = {}
+    # create the failure message
+    msg: str = msg_format.format(request_path=request.url.path, **request.path_params)
 
-    try:
-        # try to make the call for records
-        job_defs: dict = db_info.get_job_defs()
+    # log the exception
+    logger.exception(msg)
 
-        # if data was retrieved
-        if job_defs != -1:
-            # pull out the info needed for each workflow type
-            for workflow_type in job_defs:
-                # get the workflow type name
-                workflow_type_name = list(workflow_type.keys())[0]
+    # set the error message in the return
+    ret_val = [f'Error: {msg}'] if body_format == 'List' else {body_format: msg}
 
-                # init a list for the step dicts
-                steps: list = []
+    # return the error to the caller
+    return ORJSONResponse(content=ret_val, status_code=500)
 
-                # walk through the steps and grab the docker image version details
-                for step in workflow_type[workflow_type_name]:
-                    # save the step image details
-                    steps.append({list(step.keys())[0]: step.get(list(step.keys())[0])['IMAGE']})
 
-                # add the steps to this workflow type dict
-                ret_val.update({workflow_type_name: steps})
-        else:
-            ret_val = {'Warning': 'No data found.'}
+class ErrorHandlingRoute(APIRoute):
+    """
+    API route that returns the endpoint's server error response when an unexpected exception is raised.
 
-    except Exception:
-        # return a failure message
-        msg: str = 'Exception detected trying to get the component versions.'
+    The exception is handled in the route so that the response still goes out through the middleware (e.g. CORS).
+    """
 
-        # log the exception
-        logger.exception(msg)
+    def get_route_handler(self) -> typing.Callable:
+        """
+        wraps the FastAPI route handler with the exception handling
 
-        # set the status to a server error
-        status_code = 500
+        :return:
+        """
+        # get the FastAPI route handler
+        route_handler: typing.Callable = super().get_route_handler()
 
-        # set the error message in the return
-        ret_val = {'Error': msg}
+        async def handle_route(request: Request) -> Response:
+            try:
+                # run the endpoint
+                ret_val = await route_handler(request)
+            except (HTTPException, RequestValidationError):
+                # let FastAPI respond to the authentication and validation errors
+                raise
+            except Exception:
+                # create the endpoint's error response
+                ret_val = endpoint_error_response(self.name, request)
 
-    # return to the caller
-    return JSONResponse(content=ret_val, status_code=status_code, media_type="application/json")
+            # return to the caller
+            return ret_val
 
+        # return the wrapped handler
+        return handle_route
 
-@APP.get('/get_environment_type_names', dependencies=[Depends(JWTBearer(security))], status_code=200, response_model=None)
-async def get_environment_type_names() -> json:
-    """
-    Returns the distinct test types.
 
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
     """
+    creates the DB connection pools when the app starts and closes them when it stops
 
-    # init the returned html status code
-    status_code: int = 200
-    ret_val: dict = {}
+    :param _app:
+    :return:
+    """
+    # create the DB connection pools
+    await db_info.open_pools()
 
-    try:
-        # try to make the call for records
-        ret_val = db_info.get_environment_type_names()
+    # run the app
+    yield
 
-        # was there an error?
-        if ret_val == -1:
-            ret_val = {'Warning': 'No data found.'}
+    # close the DB connection pools
+    await db_info.close_pools()
 
-    except Exception:
-        # return a failure message
-        msg: str = 'Exception detected trying to get the environment types.'
 
-        # log the exception
-        logger.exception(msg)
+# declare the FastAPI details
+APP = FastAPI(title='iRODS-K8s Settings', version=app_version, lifespan=lifespan, default_response_class=ORJSONResponse)
 
-        # set the status to a server error
-        status_code = 500
+# handle unexpected endpoint exceptions in the routes
+APP.router.route_class = ErrorHandlingRoute
 
-        # set the error message in the return
-        ret_val = {'Error': msg}
+# declare app access details
+APP.add_middleware(CORSMiddleware, allow_origins=['*'], allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
 
-    # return to the caller
-    return JSONResponse(content=ret_val, status_code=status_code, media_type="application/json")
+# compress the larger responses (e.g. job definitions, run status lists). a mid-range level keeps the CPU cost per response low
+APP.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
 
 
-@APP.get('/get_test_names', dependencies=[Depends(JWTBearer(security))], status_code=200, response_model=None)
-async def get_test_names() -> json:
+def etag_matches(request: Request, etag: str) -> bool:
     """
-    Returns the distinct test types.
+    checks to see if the request's If-None-Match header has the entity tag passed. the tags are compared weakly (ignoring any W/ prefix)
 
+    :param request:
+    :param etag:
+    :return:
     """
+    # get the tags the client already has
+    client_etags: set = {tag.strip().removeprefix('W/') for tag in request.headers.get('if-none-match', '').split(',')}
 
-    # init the returned html status code
-    status_code: int = 200
-    ret_val: dict = {}
+    # return true if the client has the tag
+    return etag.removeprefix('W/') in client_etags or '*' in client_etags
 
-    try:
-        # try to make the call for records
-        ret_val = db_info.get_test_names()
 
-        # was there an error?
-        if ret_val == -1:
-            ret_val = {'Warning': 'No data found.'}
-
-    except Exception:
-        # return a failure message
-        msg: str = 'Exception detected trying to get the test names.'
+def etag_response(request: Request, content) -> Response:
+    """
+    renders the content with an entity tag so that polling clients can revalidate what they already have.
+    a 304 (not modified) response with no body is returned if the request's If-None-Match tag matches.
 
-        # log the exception
-        logger.exception(msg)
+    :param request:
+    :param content:
+    :return:
+    """
+    # render the content
+    body: bytes = orjson.dumps(content)
 
-        # set the status to a server error
-        status_code = 500
+    # get the entity tag of the rendered content. the tag is weak, as the body may also be sent gzip encoded
+    etag: str = f'W/"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
 
-        # set the error message in the return
-        ret_val = {'Error': msg}
+    # if the client has the current content
+    if etag_matches(request, etag):
+        ret_val = Response(status_code=304, headers={'ETag': etag})
+    else:
+        ret_val = Response(content=body, media_type='application/json', headers={'ETag': etag})
 
     # return to the caller
-    return JSONResponse(content=ret_val, status_code=status_code, media_type="application/json")
+    return ret_val
 
 
-@APP.get('/get_dbms_image_names', dependencies=[Depends(JWTBearer(security))], status_code=200, response_model=None)
-async def get_dbms_image_names() -> json:
+@APP.get('/get_sv_component_versions', dependencies=[Depends(JWTBearer(security))], status_code=200)
+async def get_sv_component_versions(request: Request) -> Response:
     """
-    Returns the distinct test types.
+    gets the SV image versions for this namespace
 
+    :return:
     """
 
-    # init the returned html status code
-    status_code: int = 200
-    ret_val: dict = {}
+    # try to make the call for the docker image version details for the steps of each workflow type
+    ret_val = await db_info.get_job_defs(sv_versions=True)
 
-    try:
-        # try to make the call for records
-        ret_val = db_info.get_dbms_image_names()
+    # if no data was retrieved
+    if ret_val == -1:
+        ret_val = {'Warning': 'No data found.'}
 
-        # was there an error?
-        if ret_val == -1:
-            ret_val = {'Warning': 'No data found.'}
+    # return to the caller
+    return etag_response(request, ret_val)
 
-    except Exception:
-        # return a failure message
-        msg: str = 'Exception detected trying to get the test suite types.'
 
-        # log the exception
-        logger.exception(msg)
+@APP.get('/get_environment_type_names', dependencies=[Depends(JWTBearer(security))], status_code=200)
+async def get_environment_type_names() -> ORJSONResponse:
+    """
+    Returns the distinct test types.
 
-        # set the status to a server error
-        status_code = 500
+    """
+
+    # try to make the call for records
+    ret_val = await db_info.get_environment_type_names()
 
-        # set the error message in the return
-        ret_val = {'Error': msg}
+    # was there an error?
+    if ret_val == -1:
+        ret_val = {'Warning': 'No data found.'}
 
     # return to the caller
-    return JSONResponse(content=ret_val, status_code=status_code, media_type="application/json")
+    return ORJSONResponse(content=ret_val)
 
 
-@APP.get('/get_os_image_names', dependencies=[Depends(JWTBearer(security))], status_code=200, response_model=None)
-async def get_os_image_names() -> json:
+@APP.get('/get_test_names', dependencies=[Depends(JWTBearer(security))], status_code=200)
+async def get_test_names() -> ORJSONResponse:
     """
     Returns the distinct test types.
 
     """
 
-    # init the returned html status code
-    status_code: int = 200
-    ret_val: dict = {}
+    # try to make the call for records
+    ret_val = await db_info.get_test_names()
 
-    try:
-        # try to make the call for records
-        ret_val = db_info.get_os_image_names()
+    # was there an error?
+    if ret_val == -1:
+        ret_val = {'Warning': 'No data found.'}
 
-        # was there an error?
-        if ret_val == -1:
-            ret_val = {'Warning': 'No data found.'}
+    # return to the caller
+    return ORJSONResponse(content=ret_val)
 
-    except Exception:
-        # return a failure message
-        msg: str = 'Exception detected trying to get the test suite types.'
 
-        # log the exception
-        logger.exception(msg)
+@APP.get('/get_dbms_image_names', dependencies=[Depends(JWTBearer(security))], status_code=200)
+async def get_dbms_image_names() -> ORJSONResponse:
+    """
+    Returns the distinct test types.
 
-        # set the status to a server error
-        status_code = 500
+    """
 
-        # set the error message in the return
-        ret_val = {'Error': msg}
+    # try to make the call for records
+    ret_val = await db_info.get_dbms_image_names()
+
+    # was there an error?
+    if ret_val == -1:
+        ret_val = {'Warning': 'No data found.'}
 
     # return to the caller
-    return JSONResponse(content=ret_val, status_code=status_code, media_type="application/json")
+    return ORJSONResponse(content=ret_val)
 
 
-@APP.get('/get_test_request_names', dependencies=[Depends(JWTBearer(security))], status_code=200, response_model=None)
-async def get_os_request_names() -> json:
+@APP.get('/get_os_image_names', dependencies=[Depends(JWTBearer(security))], status_code=200)
+async def get_os_image_names() -> ORJSONResponse:
     """
-    Returns the distinct test request names.
+    Returns the distinct test types.
 
     """
 
-    # init the returned html status code
-    status_code: int = 200
-    ret_val: dict = {}
+    # try to make the call for records
+    ret_val = await db_info.get_os_image_names()
 
-    try:
-        # try to make the call for records
-        ret_val = db_info.get_test_request_names()
+    # was there an error?
+    if ret_val == -1:
+        ret_val = {'Warning': 'No data found.'}
 
-        # was there an error?
-        if ret_val == -1:
-            ret_val = {'Warning': 'No data found.'}
+    # return to the caller
+    return ORJSONResponse(content=ret_val)
 
-    except Exception:
-        # return a failure message
-        msg: str = 'Exception detected trying to get the test suite types.'
 
-        # log the exception
-        logger.exception(msg)
+@APP.get('/get_test_request_names', dependencies=[Depends(JWTBearer(security))], status_code=200)
+async def get_os_request_names() -> ORJSONResponse:
+    """
+    Returns the distinct test request names.
 
-        # set the status to a server error
-        status_code = 500
+    """
+
+    # try to make the call for records
+    ret_val = await db_info.get_test_request_names()
 
-        # set the error message in the return
-        ret_val = {'Error': msg}
+    # was there an error?
+    if ret_val == -1:
+        ret_val = {'Warning': 'No data found.'}
 
     # return to the caller
-    return JSONResponse(content=ret_val, status_code=status_code, media_type="application/json")
+    return ORJSONResponse(content=ret_val)
 
 
-@APP.get('/get_run_status/', dependencies=[Depends(JWTBearer(security))], status_code=200, response_model=None)
-async def get_run_status(request_group: Union[str, None] = Query(default='')) -> json:
+@APP.get('/get_run_status/', dependencies=[Depends(JWTBearer(security))], status_code=200)
+async def get_run_status(request_group: Union[str, None] = Query(default='')) -> ORJSONResponse:
     """
     Returns the distinct test types.
 
     """
 
-    # init the returned html status code
-    status_code: int = 200
-    ret_val: list = []
-
-    try:
-        # try to make the call for records
-        ret_val = db_info.get_run_status(request_group)
-
-        # was there an error?
-        if ret_val == -1:
-            ret_val = ['Warning: No data found.']
-
-    except Exception:
-        # return a failure message
-        msg: str = 'Exception detected trying to get the run status.'
-
-        # log the exception
-        logger.exception(msg)
+    # try to make the call for records
+    ret_val = await db_info.get_run_status(request_group)
 
-        # set the status to a server error
-        status_code = 500
-
-        # set the error message in the return
-        ret_val = [f'Error: {msg}']
+    # was there an error?
+    if ret_val == -1:
+        ret_val = ['Warning: No data found.']
 
     # return to the caller
-    return JSONResponse(content=ret_val, status_code=status_code, media_type="application/json")
+    return ORJSONResponse(content=ret_val)
 
 
-@APP.get('/get_job_order/{workflow_type_name}', dependencies=[Depends(JWTBearer(security))], status_code=200, response_model=None)
-async def display_job_order(workflow_type_name: WorkflowTypeName = WorkflowTypeName('CORE')) -> json:
+@APP.get('/get_job_order/{workflow_type_name}', dependencies=[Depends(JWTBearer(security))], status_code=200)
+async def display_job_order(workflow_type_name: WorkflowTypeName = WorkflowTypeName.CORE) -> ORJSONResponse:
     """
     Displays the job order for the workflow type selected.
 
     """
 
-    # init the returned html status code
-    status_code: int = 200
-    ret_val: dict = {}
-
-    try:
-        # try to make the call for records
-        ret_val = db_info.get_job_order(WorkflowTypeName(workflow_type_name).value)
+    # get the workflow type name. FastAPI has already validated it
+    workflow_type: str = workflow_type_name.value
 
-        # was there an error?
-        if ret_val == -1:
-            ret_val = {'Warning': 'No data found.'}
+    # try to make the call for records
+    ret_val = await db_info.get_job_order(workflow_type)
 
-    except Exception:
-        # return a failure message
-        msg: str = f'Exception detected trying to get the {WorkflowTypeName(workflow_type_name).value} job order.'
-
-        # log the exception
-        logger.exception(msg)
-
-        # set the status to a server error
-        status_code = 500
-
-        # set the error message in the return
-        ret_val = {'Error': msg}
+    # was there an error?
+    if ret_val == -1:
+        ret_val = {'Warning': 'No data found.'}
 
     # return to the caller
-    return JSONResponse(content=ret_val, status_code=status_code, media_type="application/json")
+    return ORJSONResponse(content=ret_val)
 
 
-@APP.get('/reset_job_order/{workflow_type_name}', dependencies=[Depends(JWTBearer(security))], status_code=200, response_model=None)
-async def reset_job_order(workflow_type_name: WorkflowTypeName = WorkflowTypeName('CORE')) -> json:
+@APP.get('/reset_job_order/{workflow_type_name}', dependencies=[Depends(JWTBearer(security))], status_code=200)
+async def reset_job_order(workflow_type_name: WorkflowTypeName = WorkflowTypeName.CORE) -> ORJSONResponse:
     """
     Resets the job process order to the default for the workflow selected.
 
     """
 
-    # init the returned html status code
-    status_code: int = 200
-    ret_val: typing.Any = None
+    # get the workflow type name. FastAPI has already validated it
+    workflow_type: str = workflow_type_name.value
 
-    try:
-        # is this a legit workflow type?
-        if workflow_type_name in WorkflowTypeName:
-            # try to make the call for records
-            ret_val: bool = db_info_no_auto_commit.reset_job_order(WorkflowTypeName(workflow_type_name).value)
+    # try to make the call for records. the new job order is read in the same transaction as the reset
+    failed, job_order = await db_info.reset_job_order(workflow_type)
 
-            # check the return value for failure, failed == true
-            if not ret_val:
-                # get the new job order
-                job_order = db_info.get_job_order(WorkflowTypeName(workflow_type_name).value)
-
-                # return a success message with the new job order
-                ret_val: list = [{'message': f'The job order for the {WorkflowTypeName(workflow_type_name).value} workflow has been reset to the '
-                                             f'default.'}, {'job_order': job_order}]
-            else:
-                ret_val: dict = {'Error': 'Error resetting job order.'}
-        else:
-            ret_val: dict = {'Error': f'Workflow type {workflow_type_name} not found.'}
-
-    except Exception:
-        # return a failure message
-        msg: str = f'Exception detected trying to reset the {workflow_type_name} job order.'
-
-        # log the exception
-        logger.exception(msg)
-
-        # set the status to a server error
-        status_code = 500
-
-        # set the error message in the return
-        ret_val = {'Error': msg}
+    # check the return value for failure, failed == true
+    if not failed:
+        # return a success message with the new job order
+        ret_val: list = [{'message': f'The job order for the {workflow_type} workflow has been reset to the default.'}, {'job_order': job_order}]
+    else:
+        ret_val: dict = {'Error': 'Error resetting job order.'}
 
     # return to the caller
-    return JSONResponse(content=ret_val, status_code=status_code, media_type="application/json")
+    return ORJSONResponse(content=ret_val)
 
 
-@APP.get('/get_job_defs', dependencies=[Depends(JWTBearer(security))], status_code=200, response_model=None)
-async def display_job_definitions() -> json:
+@APP.get('/get_job_defs', dependencies=[Depends(JWTBearer(security))], status_code=200)
+async def display_job_definitions(request: Request) -> Response:
     """
     Displays the job definitions for all workflows. Note that this list is in alphabetical order (not in job execute order).
 
     """
-    # init the returned html status code and return value
-    status_code: int = 200
-    ret_val: dict = {}
-
-    try:
-        # try to make the call for records
-        job_data = db_info.get_job_defs()
-
-        # did we get an error?
-        if job_data != -1:
-            # make sure we got a list of config data items
-            if isinstance(job_data, list):
-                for workflow_item in job_data:
-                    # get the workflow type name
-                    workflow_type = list(workflow_item.keys())[0]
-
-                    # get the data looking like something we are used to
-                    ret_val[workflow_type] = {list(x)[0]: x.get(list(x)[0]) for x in workflow_item[workflow_type]}
-
-                    # fix the arrays for each job def. they come in as a string
-                    for item in ret_val[workflow_type].items():
-                        item[1]['COMMAND_LINE'] = json.loads(item[1]['COMMAND_LINE'])
-                        item[1]['COMMAND_MATRIX'] = json.loads(item[1]['COMMAND_MATRIX'])
-                        item[1]['PARALLEL'] = json.loads(item[1]['PARALLEL']) if item[1]['PARALLEL'] is not None else None
-            else:
-                ret_val = {'Error': 'Error: Job definitions are not a list.'}
+
+    # try to make the call for records
+    job_data = await db_info.get_job_defs()
+
+    # did we get an error?
+    if job_data != -1:
+        # make sure we got a list of config data items
+        if isinstance(job_data, list):
+            # get the job defs of each workflow type looking like something we are used to
+            ret_val = {workflow_type: {job_name: job_def for item in job_defs for job_name, job_def in item.items()}
+                       for workflow_item in job_data for workflow_type, job_defs in workflow_item.items()}
         else:
-            ret_val = {'Error': 'Error: No job definitions found.'}
+            ret_val = {'Error': 'Error: Job definitions are not a list.'}
+    else:
+        ret_val = {'Error': 'Error: No job definitions found.'}
 
-    except Exception:
-        # return a failure message
-        msg: str = 'Exception detected trying to get the job definitions'
+    # return to the caller
+    return etag_response(request, ret_val)
 
-        # log the exception
-        logger.exception(msg)
 
-        # set the status to a server error
-        status_code = 500
+@APP.post('/cache/invalidate', dependencies=[Depends(JWTBearer(security))], status_code=200)
+async def invalidate_cache() -> ORJSONResponse:
+    """
+    Clears the cached lookup data of the worker process that handles this request (best effort). Each worker process has its
+    own cache, so the other workers keep their cached data until it expires (LOOKUP_CACHE_TTL seconds).
 
-        # set the error message in the return
-        ret_val = {'Error': msg}
+    """
+    # clear the cache of this worker
+    db_info.clear_read_cache()
 
     # return to the caller
-    return JSONResponse(content=ret_val, status_code=status_code, media_type="application/json")
+    return ORJSONResponse(content={'Response': 'The lookup cache of the worker that handled this request has been cleared. Other workers '
+                                               'refresh their caches when the cached data expires.'}, status_code=200)
 
 
-@APP.get('/get_log_file_list', dependencies=[Depends(JWTBearer(security))], response_model=None)
-async def get_the_log_file_list(filter_param: str = ''):
+@APP.get('/get_log_file_list', dependencies=[Depends(JWTBearer(security))])
+async def get_the_log_file_list(filter_param: str = '') -> ORJSONResponse:
     """
     Gets the log file list. An optional filter parameter (case-insensitive) can be used to search for targeted results.
 
     """
+    # get the list of log files. the directory scan is blocking file I/O, so run it in a worker thread
+    log_file_list: dict = await asyncio.to_thread(GenUtils.get_log_file_list, filter_param)
+
     # return the list to the caller in JSON format
-    return JSONResponse(content={'Response': GenUtils.get_log_file_list(filter_param)}, status_code=200, media_type="application/json")
+    return ORJSONResponse(content={'Response': log_file_list}, status_code=200)
 
 
-@APP.get('/get_log_file/', dependencies=[Depends(JWTBearer(security))], response_model=None)
-async def get_the_log_file(log_file: str):
+@APP.get('/get_log_file/', dependencies=[Depends(JWTBearer(security))])
+async def get_the_log_file(request: Request, log_file: str) -> Response:
     """
     Gets the log file specified. This method only expects a properly named file.
 
     """
     # make sure we got a log file
     if log_file:
-        # get the log file path
-        log_file_path: str = LoggingUtil.get_log_path()
+        # reject bad file names before going to the file system
+        if log_file_name_pattern.fullmatch(log_file) is None:
+            return ORJSONResponse(content={'Response': 'Error - Invalid log file name.'}, status_code=400)
 
         # get the full path to the file
-        target_log_file_path = os.path.join(log_file_path, log_file)
+        target_log_file_path = os.path.realpath(os.path.join(log_dir_path, log_file))
 
-        # loop through the log file directory
-        for found_log_file in Path(log_file_path).rglob('*log*'):
-            # if the target file is found in the log directory
-            if target_log_file_path == str(found_log_file):
-                # return the file to the caller
-                return FileResponse(path=target_log_file_path, filename=log_file, media_type='text/plain')
+        # if the target is a log file in the log directory
+        if (os.path.commonpath([target_log_file_path, log_dir_path]) == log_dir_path and 'log' in os.path.basename(target_log_file_path) and
+                os.path.isfile(target_log_file_path)):
+            # get the file details
+            file_stat: os.stat_result = os.stat(target_log_file_path)
+
+            # create the file response. its Last-Modified header comes from the file details. the ETag is weak, as the file
+            # may also be sent gzip encoded. a log file may still be growing, so clients must revalidate it on each request
+            ret_val = FileResponse(path=target_log_file_path, filename=os.path.basename(target_log_file_path), media_type='text/plain',
+                                   stat_result=file_stat, headers={'Cache-Control': 'no-cache',
+                                                                   'ETag': f'W/"{file_stat.st_mtime_ns}-{file_stat.st_size}"'})
+
+            # if the client already has this version of the file, do not send it again
+            if etag_matches(request, ret_val.headers['etag']):
+                ret_val = Response(status_code=304, headers={key: ret_val.headers[key] for key in ('etag', 'last-modified', 'cache-control')})
+
+            # return the file to the caller
+            return ret_val
 
         # if we get here return an error
-        return JSONResponse(content={'Response': 'Error - Log file does not exist.'}, status_code=404, media_type="application/json")
+        return ORJSONResponse(content={'Response': 'Error - Log file does not exist.'}, status_code=404)
 
     # if we get here return an error
-    return JSONResponse(content={'Response': 'Error - You must select a log file.'}, status_code=404, media_type="application/json")
+    return ORJSONResponse(content={'Response': 'Error - You must select a log file.'}, status_code=404)
 
 
-@APP.get('/get_test_result_file', status_code=200, response_model=None)
-async def get_test_results_file(request_name: Union[str, None] = Query(default=None)) -> json:
+@APP.get('/get_test_result_file', status_code=200)
+async def get_test_results_file(request_name: Union[str, None] = Query(default=None)) -> Response:
     """
     Returns the zip file of test result data for the request name specified.
     <br/>&nbsp;&nbsp;&nbsp;request_name: The request name of the test run.
@@ -516,127 +496,97 @@ async def get_test_results_file(request_name: Union[str, None] = Query(default=N
             return FileResponse(path=os.path.join(target_file_path, file.name), filename=file.name, media_type='application/x-zip')
 
         # if we get here return an error
-        return JSONResponse(content={'Response': 'Error - Zip file does not exist.'}, status_code=404, media_type="application/json")
+        return ORJSONResponse(content={'Response': 'Error - Zip file does not exist.'}, status_code=404)
 
     # if we get here return an error
-    return JSONResponse(content={'Response': 'Error - You must enter a request name.'}, status_code=404, media_type="application/json")
+    return ORJSONResponse(content={'Response': 'Error - You must enter a request name.'}, status_code=404)
 
 
-@APP.put('/superv_workflow_request/{workflow_type}/run_status/{run_status}', dependencies=[Depends(JWTBearer(security))], status_code=200,
-         response_model=None)
+@APP.put('/superv_workflow_request/{workflow_type}/run_status/{run_status}', dependencies=[Depends(JWTBearer(security))], status_code=200)
 async def superv_workflow_request(workflow_type: WorkflowTypeName, run_status: RunStatus,
                                   db_type: Union[DBType, None] = Query(default=DBType.POSTGRESQL), package_dir: Union[str, None] = Query(default=''),
                                   os_image: Union[str, None] = Query(default='ubuntu-20.04:latest'),
                                   db_image: Union[str, None] = Query(default='postgres:14.11'), tests: Union[str, None] = Query(default=''),
-                                  request_group: Union[str, None] = Query(default='')) -> json:
+                                  request_group: Union[str, None] = Query(default='')) -> ORJSONResponse:
     """
     Adds a superv workflow request to the DB.
 
     """
-    # init the returned html status code
-    status_code: int = 200
+    # init the return value
     ret_val: dict = {'status': 'success'}
-    db_ret_val: int = 0
-
-    try:
-        # get the validation results
-        validation_msg: str = GenUtils.validate_settings_input(workflow_type, run_status, package_dir, tests, request_group, db_info)
 
-        # made sure all the params are valid
-        if len(validation_msg) == 0:
-            # convert the string to a dict
-            test_request = json.loads(tests)
+    # get the validation results
+    validation_msg: str = await GenUtils.validate_settings_input(package_dir, tests, request_group, db_info)
 
-            # if there are tests declared
-            if len(test_request) > 0:
-                # create base request db object
-                base_request_data: dict = {'workflow-type': workflow_type, 'db-image': db_image, 'db-type': db_type, "os-image": os_image,
-                                           'package-dir': package_dir, 'tests': None}
+    # made sure all the params are valid
+    if len(validation_msg) == 0:
+        # convert the string to a dict
+        test_request = json.loads(tests)
 
-                # get the run location
-                run_location = next(iter(test_request))
+        # if there are tests declared
+        if len(test_request) > 0:
+            # create base request db object. the tests are added for each test group when the records are inserted
+            base_request_data: dict = {'workflow-type': workflow_type, 'db-image': db_image, 'db-type': db_type, "os-image": os_image,
+                                       'package-dir': package_dir}
 
-                # was there a valid run location?
-                if run_location in ['CONSUMER', 'PROVIDER']:
+            # get the run location
+            run_location = next(iter(test_request))
 
-                    # init a storage list for the tests
-                    tests: list = []
+            # init a storage list for the test groups
+            test_groups: list = []
 
-                    # define the max number of tests in a short-running group
-                    short_batch_size: int = int(os.getenv('SHORT_BATCH_SIZE', '10'))
+            # was there a valid run location?
+            if run_location in RUN_LOCATIONS:
+                # define the max number of tests in a short-running group
+                short_batch_size: int = int(os.getenv('SHORT_BATCH_SIZE', '10'))
 
-                    # define the max number of tests in a long-running group
-                    long_batch_size: int = int(os.getenv('LONG_BATCH_SIZE', '2'))
+                # define the max number of tests in a long-running group
+                long_batch_size: int = int(os.getenv('LONG_BATCH_SIZE', '2'))
 
-                    # get a list of all the tests
-                    test_list: list = db_info.get_test_names()
+                # get the set of the tests that are long-running
+                long_running_tests: frozenset = await db_info.get_long_running_test_names()
 
-                    # get a lst of the tests that are long-running
-                    long_running_tests: list = [el['label'] for el in test_list if el['description'] == 'L']
+                # init the lists of long and shorter running tests requested
+                long_runners: list = []
+                short_runners: list = []
 
-                    # get a list of the long-running tests requested
-                    long_runners: list = [test for test in test_request[run_location] if test in long_running_tests]
+                # split the requested tests into the long and shorter running lists
+                for test in test_request[run_location]:
+                    (long_runners if test in long_running_tests else short_runners).append(test)
 
-                    # the long runners go off in batches of LONG_BATCH_SIZE
-                    for batch in batched(long_runners, long_batch_size):
-                        # append the test group
-                        tests.append({run_location: batch})
+                # build the test groups. the long runners go off in batches of LONG_BATCH_SIZE, the rest go off in batches of SHORT_BATCH_SIZE
+                test_groups = [{run_location: batch}
+                               for batch in chain(batched(long_runners, long_batch_size), batched(short_runners, short_batch_size))]
+            else:
+                logger.warning('Unrecognized test type for request group: %s.', request_group)
 
-                    # get the list of shorter running tests
-                    short_runners: list = [test for test in test_request[run_location] if test not in long_running_tests]
+            # if there were tests found
+            if len(test_groups) > 0:
+                # insert all the test groups into the DB
+                db_ret_val: int = await db_info.insert_superv_requests(run_status.value, base_request_data, test_groups, request_group)
 
-                    # the rest go off in batches of SHORT_BATCH_SIZE for short-running tests
-                    for batch in batched(short_runners, short_batch_size):
-                        # append the test group
-                        tests.append({run_location: batch})
-                else:
-                    logger.warning('Unrecognized test type for request group: %s.', request_group)
-
-                # if there were tests found
-                if len(tests) > 0:
-                    # insert each test group into the DB
-                    for item in tests:
-                        # build up the json for the DB
-                        base_request_data['tests'] = item
-
-                        # insert the record
-                        db_ret_val = db_info.insert_superv_request(run_status.value, base_request_data, request_group)
-                # else there were no valid tests requested
+                # check the result
+                if db_ret_val != 0:
+                    ret_val = {'Error': 'Error inserting database record.'}
                 else:
-                    ret_val = {'Error': 'No valid tests found.'}
-
-            # else there were no tests requested
+                    ret_val = {'Success': 'Request successfully submitted.'}
+            # else there were no valid tests requested
             else:
-                ret_val = {'Error': 'No tests requested.'}
+                ret_val = {'Error': 'No valid tests found.'}
 
-            # check the result
-            if db_ret_val != 0:
-                ret_val = {'Error': 'Error inserting database record.'}
-            else:
-                ret_val = {'Success': 'Request successfully submitted.'}
+        # else there were no tests requested
         else:
-            ret_val = {'Error': validation_msg}
-
-    except Exception:
-        # return a failure message
-        msg: str = 'Exception detected trying to generate a Superv workflow request.'
-
-        # log the exception
-        logger.exception(msg)
-
-        # set the status to a server error
-        status_code = 500
-
-        # set the error message in the return
-        ret_val = {'Error': msg}
+            ret_val = {'Error': 'No tests requested.'}
+    else:
+        ret_val = {'Error': validation_msg}
 
     # return to the caller
-    return JSONResponse(content=ret_val, status_code=status_code, media_type="application/json")
+    return ORJSONResponse(content=ret_val)
 
 
 # sets the run.properties run status to 'new' for a job
-@APP.put('/run_id/{run_id}/status/{status}', dependencies=[Depends(JWTBearer(security))], status_code=200, response_model=None)
-async def set_the_run_status(run_id: int, status: RunStatus = RunStatus('new')):
+@APP.put('/run_id/{run_id}/status/{status}', dependencies=[Depends(JWTBearer(security))], status_code=200)
+async def set_the_run_status(run_id: int, status: RunStatus = RunStatus.NEW) -> ORJSONResponse:
     """
     Updates the run status of a selected job.
 
@@ -649,21 +599,11 @@ async def set_the_run_status(run_id: int, status: RunStatus = RunStatus('new')):
 
     # is this a valid instance id
     if run_id > 0:
-        try:
-            # try to make the update
-            db_info_no_auto_commit.update_run_status(run_id, status.value)
-
-            # return a success message
-            ret_val = f'The status of run {run_id} has been set to {status}'
-        except Exception:
-            # return a failure message
-            ret_val = f'Exception detected trying to update run {run_id} to {status}'
-
-            # log the exception
-            logger.exception(ret_val)
+        # try to make the update
+        await db_info.update_run_status(run_id, status.value)
 
-            # set the status to a server error
-            status_code = 500
+        # return a success message
+        ret_val = f'The status of run {run_id} has been set to {status.value}'
     else:
         # return a failure message
         ret_val = f'Error: The instance id {run_id} is invalid. An instance must be a non-zero integer.'
@@ -675,13 +615,14 @@ async def set_the_run_status(run_id: int, status: RunStatus = RunStatus('new')):
         status_code = 400
 
     # return to the caller
-    return JSONResponse(content={'Response': ret_val}, status_code=status_code, media_type="application/json")
+    return ORJSONResponse(content={'Response': ret_val}, status_code=status_code)
 
 
 # Updates a supervisor component's next process.
 @APP.put('/workflow_type_name/{workflow_type_name}/job_type_name/{job_type_name}/next_job_type/{next_job_type_name}',
-         dependencies=[Depends(JWTBearer(security))], status_code=200, response_model=None)
-async def set_the_supervisor_job_order(workflow_type_name: WorkflowTypeName, job_type_name: JobTypeName, next_job_type_name: NextJobTypeName):
+         dependencies=[Depends(JWTBearer(security))], status_code=200)
+async def set_the_supervisor_job_order(workflow_type_name: WorkflowTypeName, job_type_name: JobTypeName,
+                                       next_job_type_name: JobTypeName) -> ORJSONResponse:
     """
     Modifies the supervisor component's linked list of jobs. Select the workflow type, then select the job process name and the next job
     process name.
@@ -690,51 +631,46 @@ async def set_the_supervisor_job_order(workflow_type_name: WorkflowTypeName, job
     # init the returned html status code
     status_code: int = 200
 
-    try:
-        # check for a recursive situation
-        if job_type_name == next_job_type_name:
-            # set the error msg
-            ret_val = f'You cannot specify a next job type equal to the target job type ({job_type_name}).'
+    # get the workflow type name. FastAPI has already validated it
+    workflow_type: str = workflow_type_name.value
 
-            # declare an error for the user
-            status_code = 500
-        else:
-            # convert the next job process name to an id
-            next_job_type_id = GenUtils.job_type_name_to_id.get(NextJobTypeName(next_job_type_name).value)
+    # check for a recursive situation
+    if job_type_name == next_job_type_name:
+        # set the error msg
+        ret_val = f'You cannot specify a next job type equal to the target job type ({job_type_name.value}).'
 
-            # did we get a good type id
-            if next_job_type_name is not None:
-                # prep the record to update key. complete does not have a hyphen
-                if job_type_name != 'complete':
-                    job_type_name += '-'
+        # declare an error for the user
+        status_code = 500
+    else:
+        # convert the next job process name to an id. FastAPI has already validated the name. the enum members are strings,
+        # so they look up the name keys directly
+        next_job_type_id = GenUtils.job_type_name_to_id.get(next_job_type_name)
 
-                # make the update
-                db_info.update_next_job_for_job(job_type_name, next_job_type_id, WorkflowTypeName(workflow_type_name).value)
+        # did we get a good type id
+        if next_job_type_id is not None:
+            # prep the record to update key. complete does not have a hyphen
+            job_name: str = job_type_name.value if job_type_name.value == 'complete' else f'{job_type_name.value}-'
 
-                # get the new job order
-                job_order = db_info.get_job_order(WorkflowTypeName(workflow_type_name).value)
+            # make the update. the new job order is read in the same transaction as the update
+            failed, job_order = await db_info.update_next_job_for_job(job_name, next_job_type_id, workflow_type)
 
+            # check the return value for failure, failed == true
+            if not failed:
                 # return a success message with the new job order
-                ret_val = [{
-                    'message': f'The {WorkflowTypeName(workflow_type_name).value} {job_type_name} next process has been set to {next_job_type_name}'},
-                    {'new_order': job_order}]
+                ret_val = [{'message': f'The {workflow_type} {job_name} next process has been set to {next_job_type_name.value}'},
+                           {'new_order': job_order}]
             else:
                 # set the error msg
-                ret_val = f'The next job process ID was not found for {WorkflowTypeName(workflow_type_name).value} {next_job_type_name}'
+                ret_val = f'Error updating the {workflow_type} {job_name} next process to {next_job_type_name.value}.'
 
                 # declare an error for the user
                 status_code = 500
+        else:
+            # set the error msg
+            ret_val = f'The next job process ID was not found for {workflow_type} {next_job_type_name.value}'
 
-    except Exception:
-        # return a failure message
-        ret_val = f'Exception detected trying to update the {WorkflowTypeName(workflow_type_name).value} next job name for' \
-                  f' {job_type_name}, next job name: {next_job_type_name}'
-
-        # log the exception
-        logger.exception(ret_val)
-
-        # set the status to a server error
-        status_code = 500
+            # declare an error for the user
+            status_code = 500
 
     # return to the caller
-    return JSONResponse(content={'Response': ret_val}, status_code=status_code, media_type="application/json")
+    return ORJSONResponse(content={'Response': ret_val}, status_code=status_code)
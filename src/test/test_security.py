@@ -8,11 +8,16 @@
     Author: Phil Owen, 6/27/2023
 """
 import os
+import asyncio
 
 import requests
 import pytest
 
+from fastapi import HTTPException
+from starlette.requests import Request
+
 from src.common.security import Security
+from src.common.bearer import JWTBearer
 
 
 @pytest.mark.skip(reason="Local test only")
@@ -63,6 +68,44 @@ def test_decode_jwt():
     assert not ret_val
 
 
+# @pytest.mark.skip(reason="Local test only")
+def test_bearer_token_cache():
+    """
+    tests that validated JWT tokens are cached and invalid tokens are not
+
+    :return:
+    """
+    # create a security object
+    sec = Security()
+
+    # create a bearer object
+    bearer = JWTBearer(sec)
+
+    # create a payload for the token generation
+    payload = {'bearer_name': os.environ.get("BEARER_NAME"), 'bearer_secret': os.environ.get("BEARER_SECRET")}
+
+    # create a new token
+    token = sec.sign_jwt(payload)['access_token']
+
+    # create a request that has the token in the auth header
+    request = Request({'type': 'http', 'headers': [(b'authorization', f'Bearer {token}'.encode())]})
+
+    # validate the token
+    ret_val = asyncio.run(bearer(request))
+
+    # validate the result
+    assert ret_val == token and bearer.is_token_cached(token)
+
+    # create a request with an invalid token
+    request = Request({'type': 'http', 'headers': [(b'authorization', f'Bearer {token}this-will-fail'.encode())]})
+
+    # an invalid token should be rejected and not cached
+    with pytest.raises(HTTPException):
+        asyncio.run(bearer(request))
+
+    assert not bearer.is_token_cached(token + 'this-will-fail')
+
+
 # @pytest.mark.skip(reason="Local test only")
 def test_access():
     """
@@ -0,0 +1,136 @@
+# BSD 3-Clause All rights reserved.
+#
+# SPDX-License-Identifier: BSD 3-Clause
+
+"""
+    Server endpoint tests. These do not need a database.
+"""
+import os
+import importlib
+
+import pytest
+
+from fastapi.testclient import TestClient
+
+from src.common.security import Security
+
+
+@pytest.fixture(name='log_client')
+def fixture_log_client(tmp_path, monkeypatch):
+    """
+    creates a test client for the app, with the log directory pointed at a test directory
+
+    :return:
+    """
+    # create a log directory with a log file in a subdirectory, and a log file outside the log directory
+    log_dir = tmp_path / 'logs'
+    (log_dir / 'sub').mkdir(parents=True)
+    (log_dir / 'sub' / 'other.log').write_text('other log data')
+    (tmp_path / 'x.log').write_text('not in the log directory')
+
+    # the DB connection config and log path are read when the server module is loaded. the connection pools are not opened
+    # by the test client
+    monkeypatch.setenv('IRODS_SV_DB_PORT', '5432')
+    monkeypatch.setenv('LOG_PATH', str(log_dir))
+
+    # get the server module
+    server = importlib.import_module('src.server')
+
+    # point the log file requests at the test log directory
+    monkeypatch.setattr(server, 'log_dir_path', os.path.realpath(log_dir))
+
+    # create a token for the requests
+    sec = Security()
+    token = sec.sign_jwt({'bearer_name': os.environ.get("BEARER_NAME"), 'bearer_secret': os.environ.get("BEARER_SECRET")})
+
+    # return the client and the auth header to the caller
+    return TestClient(server.APP), {'Authorization': f'Bearer {token["access_token"]}'}
+
+
+def test_get_log_file_path_checks(log_client, tmp_path):
+    """
+    tests that only files in the log directory are returned
+
+    :return:
+    """
+    # get the client and auth header
+    client, auth_header = log_client
+
+    # a relative path out of the log directory is rejected
+    ret_val = client.get('/get_log_file/', params={'log_file': '../x.log'}, headers=auth_header)
+
+    # check the result
+    assert ret_val.status_code in (400, 404)
+
+    # an absolute path is rejected
+    for log_file in (str(tmp_path / 'x.log'), '/etc/x.log'):
+        ret_val = client.get('/get_log_file/', params={'log_file': log_file}, headers=auth_header)
+
+        # check the result
+        assert ret_val.status_code in (400, 404)
+
+
+@pytest.mark.usefixtures('log_client')
+def test_log_file_name_pattern():
+    """
+    tests that the log file name pattern only passes file names in the log directory or its subdirectories
+
+    :return:
+    """
+    # get the server module. the client fixture has already loaded it
+    server = importlib.import_module('src.server')
+
+    # these are legit log file names
+    for log_file in ('iRODS.Settings.log', 'sub/other.log', 'sub/iRODS.Settings.log.1', 'a..log', 'sub/..log/x.log'):
+        assert server.log_file_name_pattern.fullmatch(log_file) is not None
+
+    # these reach outside the log directory or are not log file names
+    for log_file in ('../x.log', 'sub/../../x.log', '..', 'sub/..', '/etc/x.log', 'readme.txt', ''):
+        assert server.log_file_name_pattern.fullmatch(log_file) is None
+
+
+def test_get_log_file(log_client):
+    """
+    tests that a log file in a log subdirectory is returned, and that a client that has it is not sent it again
+
+    :return:
+    """
+    # get the client and auth header
+    client, auth_header = log_client
+
+    # get a log file in a subdirectory
+    ret_val = client.get('/get_log_file/', params={'log_file': 'sub/other.log'}, headers=auth_header)
+
+    # check the result
+    assert ret_val.status_code == 200 and ret_val.text == 'other log data'
+    assert 'filename="other.log"' in ret_val.headers['content-disposition']
+
+    # request it again with the tag of the copy the client has
+    ret_val = client.get('/get_log_file/', params={'log_file': 'sub/other.log'}, headers={**auth_header, 'If-None-Match': ret_val.headers['etag']})
+
+    # check the result
+    assert ret_val.status_code == 304 and not ret_val.content
+
+
+def test_set_the_run_status_invalid_id(log_client, caplog):
+    """
+    tests that an invalid run id is rejected as a bad request, and that it is logged as an error
+
+    :return:
+    """
+    # get the client and auth header
+    client, auth_header = log_client
+
+    # the service logger does not propagate, so capture its records directly
+    server = importlib.import_module('src.server')
+    server.logger.addHandler(caplog.handler)
+
+    try:
+        # try to update the status of an invalid run id. this is rejected before going to the DB
+        ret_val = client.put('/run_id/0/status/new', headers=auth_header)
+    finally:
+        server.logger.removeHandler(caplog.handler)
+
+    # check the result
+    assert ret_val.status_code == 400 and 'instance id 0 is invalid' in ret_val.json()['Response']
+    assert [record.levelname for record in caplog.records] == ['ERROR']
@@ -0,0 +1,76 @@
+# BSD 3-Clause All rights reserved.
+#
+# SPDX-License-Identifier: BSD 3-Clause
+
+"""
+    General utilities tests.
+"""
+from pathlib import Path
+
+from src.common.utils import GenUtils
+
+
+def test_get_log_file_list(tmp_path, monkeypatch):
+    """
+    tests the log file list matches what a recursive glob of the log directory finds
+
+    :return:
+    """
+    # create some log and non-log files in the log directory and a subdirectory
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'iRODS.Settings.log').write_text('log data')
+    (tmp_path / 'iRODS.Settings.log.1').write_text('old log data')
+    (tmp_path / 'sub' / 'other.log').write_text('other log data')
+    (tmp_path / 'readme.txt').write_text('not a log')
+
+    # point the log path at the test directory
+    monkeypatch.setenv('LOG_PATH', str(tmp_path))
+
+    # get the log file list
+    ret_val = GenUtils.get_log_file_list()
+
+    # get the expected files the way a recursive glob finds them
+    expected = {str(file_path)[len(str(tmp_path)) + 1:]: f'{file_path.stat().st_size} bytes' for file_path in Path(tmp_path).rglob('*log*')}
+
+    # check the result
+    assert {item['file_path']: item['file_size'] for item in ret_val.values()} == expected
+
+    # get a filtered log file list
+    ret_val = GenUtils.get_log_file_list('other')
+
+    # check the result
+    assert [item['file_path'] for item in ret_val.values()] == ['sub/other.log']
+
+    # get a filtered log file list that finds nothing
+    ret_val = GenUtils.get_log_file_list('missing')
+
+    # check the result
+    assert 'Warning' in ret_val
+
+
+def test_get_log_file_list_cache(tmp_path, monkeypatch):
+    """
+    tests the log file list is reused until the cache TTL expires
+
+    :return:
+    """
+    # create a log file in the log directory
+    (tmp_path / 'first.log').write_text('log data')
+
+    # point the log path at the test directory
+    monkeypatch.setenv('LOG_PATH', str(tmp_path))
+
+    # get the log file list
+    ret_val = GenUtils.get_log_file_list()
+
+    # add another log file
+    (tmp_path / 'second.log').write_text('log data')
+
+    # the cached list is returned
+    assert GenUtils.get_log_file_list() == ret_val
+
+    # expire the cached list
+    monkeypatch.setattr(GenUtils, 'log_file_list_ttl', 0.0)
+
+    # the new file is found
+    assert len(GenUtils.get_log_file_list()) == 2